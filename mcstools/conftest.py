@@ -1,7 +1,11 @@
+import shutil
+
 import numpy as np
 import pytest
 
-from mcsfile import MCSL1BFile
+from data_path_handler import L1BDataPathHandler
+from loader import MCSL1BLoader, MCSL22dLoader
+from mcsfile import MCSL1BFile, MCSL22dFile
 from reader import MCSL1BReader
 
 
@@ -14,6 +18,67 @@ def l1b_file():
 def l1b_reader():
     return MCSL1BReader()
 
+@pytest.fixture()
+def l1b_path_handler(tmp_path):
+    """
+    L1B path handler with one existing file, 100101040000.L1B
+    """
+    date_dir = tmp_path / "level_1b" / "1001"
+    date_dir.mkdir(parents=True)
+    (date_dir / "100101040000.L1B").touch()
+    return L1BDataPathHandler(str(tmp_path))
+
+
+@pytest.fixture()
+def l1b_loader():
+    return MCSL1BLoader("test")
+
+
+@pytest.fixture()
+def l1b_range_loader(tmp_path):
+    """
+    L1B loader with test/top.L1B as the file starting 2008-12-21 20:00
+    """
+    date_dir = tmp_path / "level_1b" / "0812"
+    date_dir.mkdir(parents=True)
+    shutil.copy("test/top.L1B", date_dir / "081221200000.L1B")
+    return MCSL1BLoader(str(tmp_path))
+
+
+@pytest.fixture()
+def l22d_loader(tmp_path):
+    return MCSL22dLoader(str(tmp_path))
+
+
+@pytest.fixture()
+def l22d_cache_loader(tmp_path):
+    return MCSL22dLoader(str(tmp_path), use_cache=True)
+
+
+@pytest.fixture()
+def l22d_path(tmp_path):
+    """
+    Write a small L2 file with two profiles and return its path
+    """
+    l22d_file = MCSL22dFile()
+    lines = ["# synthetic L2 file for tests"]
+    for record in l22d_file.data_records.values():
+        lines.append(", ".join(record["columns"]))
+    for prof in range(2):
+        for i, record in enumerate(l22d_file.data_records.values()):
+            for level in range(record["lines"]):
+                values = [str(i + 1)] + [
+                    f"{prof}.{level}" for _ in record["columns"][1:]
+                ]
+                if i == 0:
+                    values[1:4] = ['"01-Jan-2010"', '"00:00:00.000"', "0"]
+                    values[6] = str(prof)  # integer Orb_num
+                lines.append(", ".join(values))
+    path = tmp_path / "100101000000.L2"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
 @pytest.fixture()
 def sphere_coords():
     return np.array([8, np.pi / 6, np.pi / 4])
@@ -1,10 +1,66 @@
 import datetime as dt
+import functools
+import logging
 import os
 
+import numpy as np
 import pandas as pd
 from util.mars_time import MarsDate
 
-from util.time import round_to_x_hour
+from util.time import floor_to_x_hour
+
+logger = logging.getLogger(__name__)
+
+FOUR_HOUR_OFFSET = pd.offsets.Hour(4)  # spacing of MCS file start times
+FOUR_HOURS = dt.timedelta(hours=4)  # same spacing, for datetime arithmetic
+DIRECTORY_FMT = "%y%m"  # YYMM directory name
+FILESTR_FMT = "%y%m%d%H%M%S"  # 12-digit filebase
+
+
+@functools.lru_cache(maxsize=32)
+def level_base_directory(mcs_data_path: str, level_dir_name: str) -> str:
+    """
+    Path to L1B or L2 base directory (cached, shared by all handlers
+    for the same data path)
+    """
+    return os.path.join(mcs_data_path, level_dir_name)
+
+
+@functools.lru_cache(maxsize=4096)
+def year_month_directory(level_directory: str, year: int, month: int) -> str:
+    """
+    Path to YYMM directory for a year and month (cached, shared by all dates
+    in a month)
+    """
+    return f"{level_directory}{os.sep}{year % 100:02d}{month:02d}"
+
+
+@functools.lru_cache(maxsize=8192)
+def date_to_4hour_filestr(date: dt.datetime) -> str:
+    """
+    12-digit filestr of 4-hour file containing date (cached)
+    """
+    return (
+        f"{date.year % 100:02d}{date.month:02d}{date.day:02d}"
+        f"{(date.hour // 4) * 4:02d}0000"
+    )
+
+
+@functools.lru_cache(maxsize=8192)
+def filestr_to_datetime(fs: str) -> dt.datetime:
+    """
+    Datetime of 12-digit filestr (cached, the same files recur
+    across loads)
+    """
+    # fixed-width fields, so slice instead of strptime
+    return dt.datetime(
+        2000 + int(fs[0:2]),
+        int(fs[2:4]),
+        int(fs[4:6]),
+        int(fs[6:8]),
+        int(fs[8:10]),
+        int(fs[10:12]),
+    )
 
 
 class DataPathHandler:
@@ -16,27 +72,53 @@ class DataPathHandler:
     # Level specific variables
     level_dir_name = None  # directory name
     level_suffix = None  # file suffix
+    problem_files = frozenset()  # existing files to ignore
 
     def __init__(self, mcs_data_path):
+        super().__init__()
         self.mcs_directory = mcs_data_path
         self.level_directory = self.build_level_directory(self.level_dir_name)
 
+    def list_directory_files(self, directories) -> dict:
+        """
+        Get names of files in each directory, with a single
+        directory scan each (instead of checking every path).
+        Missing directories have no files.
+        """
+        present = {}
+        for directory in set(directories):
+            try:
+                with os.scandir(directory or os.curdir) as entries:
+                    present[directory] = {e.name for e in entries}
+            except (FileNotFoundError, NotADirectoryError):
+                present[directory] = set()
+        return present
+
+    def is_remote(self) -> bool:
+        """
+        Check if data path is a URL (e.g. PDS), where files can't be listed
+        """
+        return str(self.mcs_directory).startswith(("http://", "https://"))
+
     def check_for_files(self, expected_paths: list):
-        dont_exist = [f for f in expected_paths if not os.path.exists(f)]
-        problem_files = []
+        if self.is_remote():
+            # no filesystem to check, assume all files exist
+            return list(expected_paths), []
+        split_paths = [os.path.split(f) for f in expected_paths]
+        present = self.list_directory_files(d for d, _ in split_paths)
+        # classify every path in a single pass
+        paths, dont_exist, ignore = [], [], []
+        for f, (directory, name) in zip(expected_paths, split_paths):
+            if name not in present[directory]:
+                dont_exist.append(f)
+            elif name in self.problem_files:
+                ignore.append(f)
+            else:
+                paths.append(f)
         if dont_exist:
-            print(f"The following files were not found:\n{dont_exist}")
-        if any(
-            [
-                x
-                for x in expected_paths
-                if os.path.basename(x) in problem_files and x not in dont_exist
-            ]
-        ):
-            ignore = [x for x in expected_paths if os.path.basename(x) in problem_files]
-            print(f"Ignoring files: {ignore}")
-            expected_paths = [x for x in expected_paths if x not in ignore]
-        paths = [f for f in expected_paths if os.path.exists(f)]
+            logger.warning("The following files were not found:\n%s", dont_exist)
+        if ignore:
+            logger.warning("Ignoring files: %s", ignore)
         return paths, dont_exist
 
     def build_level_directory(self, level_directory):
@@ -44,32 +126,30 @@ class DataPathHandler:
         Build path to L1B or L2 base directory
         /path/to/mcs_data/level_1b/
         """
-        return os.path.join(self.mcs_directory, level_directory)
+        return level_base_directory(self.mcs_directory, level_directory)
 
     def build_date_directory(self, date):
         """
         Build path to L1B year-month directory
         /path/to/mcs_data/level_1b/YYMM/
         """
-        day_fmt = date.strftime("%Y%m")[2:]  # Years as two digits
-        return os.path.join(self.level_directory, day_fmt)
+        return year_month_directory(self.level_directory, date.year, date.month)
 
     def filedt_to_filestr(self, fdt):
         """
         Convert datetime to 12-digit filebase structure.
         Will not match real filename if not rounded to 4-hour
         """
-        return fdt.strftime("%y%m%d%H%M%S")
+        return (
+            f"{fdt.year % 100:02d}{fdt.month:02d}{fdt.day:02d}"
+            f"{fdt.hour:02d}{fdt.minute:02d}{fdt.second:02d}"
+        )
 
     def date_to_filestr(self, date):
         """
         Round datetime to 4-hour time file
         """
-        file_dt = round_to_x_hour(
-            date, hours=4, force_down=True
-        )  # convert times to 4-hour format
-        file_str = self.filedt_to_filestr(file_dt)
-        return file_str
+        return date_to_4hour_filestr(date)
 
     def build_date_path(self, date):
         """
@@ -78,41 +158,44 @@ class DataPathHandler:
         /path/to/mcs_data/level_1b/YYMM/YYMMDDHHMMSS.L1B
         """
         file_str = self.date_to_filestr(date)
-        path = os.path.join(
-            self.build_date_directory(date),
-            file_str + self.level_suffix,
-        )
-        return path
+        # components are known to be clean, so concatenate directly
+        return f"{self.build_date_directory(date)}{os.sep}{file_str}{self.level_suffix}"
 
     def build_paths_from_daterange(
         self, start: dt.datetime, end: dt.datetime
     ) -> list:
         """
-        Build paths to all files spanning range.
+        Build paths to all files spanning range, in time order.
         Rounds start date down to nearest 4-hour and
         end date up to nearest 4-hour
         """
-        start = round_to_x_hour(
-            start, hours=4, force_down=True
-        )  # convert times to 4-hour format
-        end = round_to_x_hour(end, hours=4, force_up=True)
+        start = floor_to_x_hour(start, hours=4)  # convert times to 4-hour format
+        # always include file containing end time
+        end = floor_to_x_hour(end, hours=4) + FOUR_HOURS
         datetimes = pd.date_range(
-            start, end, freq="4H", closed="left"
+            start, end, freq=FOUR_HOUR_OFFSET, inclusive="left"
         )  # generate file datetimes (4-hour fmt)
-        # Build paths for each 4-hour date
-        files = [self.build_date_path(d) for d in datetimes]
-        return files
+        return self.build_paths_from_datetimes(datetimes)
+
+    def build_paths_from_datetimes(self, datetimes: pd.DatetimeIndex) -> list:
+        """
+        Build paths to files starting at each (4-hour aligned) datetime.
+        Formats the whole index at once rather than per date.
+        """
+        # YYMM/YYMMDDHHMMSS in a single strftime pass
+        names = datetimes.strftime(f"{DIRECTORY_FMT}{os.sep}{FILESTR_FMT}")
+        prefix = f"{self.level_directory}{os.sep}"
+        return [f"{prefix}{name}{self.level_suffix}" for name in names]
 
     def filestr_to_filedt(self, fs):
         "Convert 12-digit filebase structure to datetime"
-        file_dt = dt.datetime.strptime(fs, "%y%m%d%H%M%S")
-        return file_dt
+        return filestr_to_datetime(fs)
 
     def path_to_filedt(self, path):
         """
         Convert full path of file to datetime
         """
-        return self.filestr_to_filedt(os.path.splitext(os.path.basename(path))[0])
+        return self.filestr_to_filedt(os.path.basename(path).split(".", 1)[0])
 
     def find_file_from_date(self, date):
         """
@@ -132,12 +215,25 @@ class DataPathHandler:
 
     def find_files_from_daterange(self, start: dt.datetime, end: dt.datetime):
         """
-        Build paths and check if each file exists
+        Build paths and check if each file exists.
+        Paths are returned in time order, so don't need sorting.
         """
-        expected_paths = sorted(self.build_paths_from_daterange(start, end))
+        # paths are built in time order
+        expected_paths = self.build_paths_from_daterange(start, end)
         paths, missing = self.check_for_files(expected_paths)
         return paths, missing
 
+    def find_files_from_datetimes(self, datetimes):
+        """
+        Build paths to files containing each datetime and check if they exist.
+        Datetimes are floored to 4-hour and deduplicated first,
+        so each file is built and checked once (in time order).
+        """
+        # np.unique sorts and deduplicates in one pass
+        file_dts = np.unique(pd.DatetimeIndex(datetimes).floor(FOUR_HOUR_OFFSET))
+        expected_paths = self.build_paths_from_datetimes(pd.DatetimeIndex(file_dts))
+        return self.check_for_files(expected_paths)
+
     def find_files_from_marsdaterange(self, start: MarsDate, end: MarsDate):
         """
         Build paths given a start/end MY-Ls range and check if each file exist.
@@ -150,27 +246,32 @@ class DataPathHandler:
         """
         Build paths to files before a given date
         """
-        start = date - dt.timedelta(hours=4 * n)  # get datetime for prev file
-        end = date - dt.timedelta(hours=4)
+        start = date - n * FOUR_HOURS  # get datetime for prev file
+        end = date - FOUR_HOURS
         return self.find_files_from_daterange(start, end)
 
     def find_n_following_files_from_date(self, date, n):
         """
         Build paths to files after a given date
         """
-        start = date + dt.timedelta(hours=4)
-        end = date + dt.timedelta(hours=4 * n)
+        start = date + FOUR_HOURS
+        end = date + n * FOUR_HOURS
         return self.find_files_from_daterange(start, end)
 
     def find_files_around_date(self, date, n):
-        files_before = self.find_n_preceding_files_from_date(date, n)
-        files_after = self.find_n_following_files_from_date(date, n)
-        file = self.find_file_from_date(date)
-        files = (
-            [x for x in files_before[0] + [file[0]] + files_after[0] if x],
-            [x for x in files_before[1] + [file[1]] + files_after[1] if x],
-        )
-        return (sorted(files[0]), sorted(files[1]))
+        """
+        Build paths to file containing date and n files before and after it
+        (in time order), and check if each file exists
+        """
+        if n == 0:
+            expected_paths = [self.build_date_path(date)]
+        else:
+            # whole window in one pass, rather than before/at/after separately
+            center = floor_to_x_hour(date, hours=4)
+            expected_paths = self.build_paths_from_daterange(
+                center - n * FOUR_HOURS, center + n * FOUR_HOURS
+            )
+        return self.check_for_files(expected_paths)
 
     def find_files_around_file(self, f, n):
         return self.find_files_around_date(self.path_to_filedt(f), n)
@@ -179,7 +280,7 @@ class DataPathHandler:
 class L1BDataPathHandler(DataPathHandler):
     level_dir_name = "level_1b"
     level_suffix = ".L1B"
-    problem_files = ["150826040000.L1B"]
+    problem_files = frozenset({"150826040000.L1B"})
 
 
 class L22dDataPathHandler(DataPathHandler):
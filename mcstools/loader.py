@@ -1,11 +1,57 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import dask.dataframe as dd
 import pandas as pd
-from dask import delayed
+import pyarrow as pa
+import pyarrow.dataset as ds
 import util.mars_time as mt
+from util.time import convert_date_utc_columns
 
 from data_path_handler import L1BDataPathHandler, L22dDataPathHandler
 from reader import MCSL1BReader, MCSL22dReader
 
+logger = logging.getLogger(__name__)
+
+MAX_READ_WORKERS = 16  # max threads used to read files concurrently
+PARTITIONS_PER_WORKER = 4  # default dask partitions per core when loading
+
+
+def as_file_list(files) -> list:
+    """
+    Normalize a single filename or an iterable of filenames to a list
+    """
+    if isinstance(files, (str, os.PathLike)):
+        return [files]
+    return list(files)
+
+
+def concat_frames(dfs: list) -> pd.DataFrame:
+    """
+    Concatenate per-file DataFrames into one with a fresh index.
+    A single frame is returned as is, without a copy.
+    """
+    if len(dfs) == 1:
+        return dfs[0]
+    return pd.concat(dfs, copy=False, ignore_index=True)
+
+
+def categorize_filenames(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store L2 filename column as categorical, so each name is kept once.
+    Done after reducing to profiles, joins are faster on plain strings.
+    """
+    data["filename"] = data["filename"].astype("category")
+    return data
+
+
+def is_sorted(items: list) -> bool:
+    """
+    Check if list is already in ascending order
+    """
+    return all(a <= b for a, b in zip(items, items[1:]))
+
 
 class MCSL1BLoader(L1BDataPathHandler, MCSL1BReader):
     """
@@ -13,66 +59,361 @@ class MCSL1BLoader(L1BDataPathHandler, MCSL1BReader):
     Requires path handler to generate filenames in different.
     """
 
-    def __init__(self, mcs_data_path):
+    def __init__(self, mcs_data_path, max_workers=MAX_READ_WORKERS):
+        """
+        max_workers: max threads used to read files concurrently
+        """
         super().__init__(mcs_data_path)
+        self.max_workers = max_workers
+
+    def load(
+        self,
+        files,
+        dask=False,
+        files_per_partition=None,
+        presorted=False,
+        usecols=None,
+    ):
+        """
+        Load one or more L1B files.
 
-    def load(self, files, dask=False):
-        if type(files) != list:
-            return self.read(files)
-        elif len(files) == 0:
-            df = pd.DataFrame(columns=self.columns)
+        Parameters
+        ----------
+        files: filename or list of filenames
+        dask: return a dask DataFrame instead of pandas
+        files_per_partition: number of files read into each dask partition,
+            by default enough for ~PARTITIONS_PER_WORKER partitions per core
+        presorted: files are known to be in time order, skip checking
+        usecols: columns to read from files (all if not specified)
+
+        Returns
+        -------
+        df: loaded data
+        """
+        files = as_file_list(files)
+        if len(files) == 0:
+            df = self.make_empty_df(usecols=usecols)
+            if dask:
+                # same return type whether or not files were found
+                df = dd.from_pandas(df, npartitions=1)
         else:
+            # filenames sort by time, lists from find_files_* already are
+            if not presorted and not is_sorted(files):
+                files = sorted(files)
             if not dask:
-                df = pd.concat([self.read(f) for f in sorted(files)])
+                # combine all files as arrow tables, one conversion to pandas
+                df = self.read_many(
+                    files, usecols=usecols, max_workers=self.max_workers
+                )
             else:
-                dfs = [delayed(self.read)(f) for f in sorted(files)]
-                df = dd.from_delayed(dfs)
+                if files_per_partition is None:
+                    # few larger tasks, scheduling overhead is per task
+                    n_partitions = PARTITIONS_PER_WORKER * (os.cpu_count() or 1)
+                    files_per_partition = max(1, len(files) // n_partitions)
+                partitions = [
+                    files[i : i + files_per_partition]
+                    for i in range(0, len(files), files_per_partition)
+                ]
+                # column types from a single file, so building the graph
+                # doesn't read a whole partition
+                meta = self.read_many(files[:1], usecols=usecols).iloc[:0]
+                df = dd.from_map(
+                    self.read_partition, partitions, usecols=usecols, meta=meta
+                )
         return df
 
+    def read_partition(self, files, usecols=None):
+        """
+        Read several files into a single DataFrame (one dask partition)
+        """
+        return self.read_many(files, usecols=usecols)
+
+    def add_dt(self, data):
+        """
+        Add "dt" column of datetimes from "Date" and "UTC" columns
+        """
+        data["dt"] = convert_date_utc_columns(data["Date"], data["UTC"])
+        return data
+
+    def with_dt(self, data):
+        """
+        Copy of data with added "dt" column, for dask partitions
+        (which mustn't be modified in place)
+        """
+        return data.assign(dt=convert_date_utc_columns(data["Date"], data["UTC"]))
+
+    def load_date_range(self, start_time, end_time, dask=False):
+        """
+        Load L1B data from start_time up to (not including) end_time.
+        Files span 4-hour blocks, so rows outside the range are trimmed.
+
+        Parameters
+        ----------
+        start_time/end_time: beginning/end of range
+        dask: return a lazy dask DataFrame, only the first file is read
+            (for column types) until it is computed
+
+        Returns
+        -------
+        data: loaded data with added "dt" column
+        """
+        if end_time <= start_time:
+            files = []  # empty range, no files to look for
+        else:
+            files = self.find_files_from_daterange(start_time, end_time)[0]
+        if dask:
+            data = self.load(files, presorted=True, dask=True)
+            # meta given, so dask doesn't call with_dt on its own meta frame
+            data = data.map_partitions(self.with_dt, meta=self.with_dt(data._meta))
+            # one fused comparison per partition rather than two masks
+            return data[data["dt"].between(start_time, end_time, inclusive="left")]
+        data = self.add_dt(self.load(files, presorted=True))
+        if not data["dt"].is_monotonic_increasing:
+            # rarely out of order (e.g. repeated rows), a stable sort keeps
+            # rows of equal times in file order
+            data = data.sort_values("dt", kind="stable", ignore_index=True)
+        # rows are in time order, so the range is one slice
+        lo, hi = data["dt"].searchsorted([start_time, end_time], side="left")
+        return data.iloc[lo:hi].reset_index(drop=True)
+
+    def load_ls_range(
+        self, my: int, start_ls: float, end_ls: float, **kwargs
+    ) -> pd.DataFrame:
+        """
+        Load L1B data within Ls range of a given Mars Year
+
+        Parameters
+        ----------
+        my: Mars Year
+        start_ls/end_ls: beginning/end of Ls range
+        kwargs: passed to ``load_date_range`` (e.g. dask)
+
+        Returns
+        -------
+        _: loaded L1B data
+        """
+        # Ls increases with time, so the range is a date range and rows
+        # are trimmed with the same sorted slice
+        date_start = mt.MY_Ls_to_UTC(my, start_ls)
+        date_end = mt.MY_Ls_to_UTC(my, end_ls)
+        return self.load_date_range(date_start, date_end, **kwargs)
+
+    def load_from_datetimes(self, datetimes, **kwargs):
+        """
+        Load L1B files containing any of the given datetimes
+        """
+        files, _ = self.find_files_from_datetimes(datetimes)
+        return self.load(files, presorted=True, **kwargs)
+
     def load_files_around_date(self, date, n=1, **kwargs):
         files, _ = self.find_files_around_date(date, n)
-        return self.load(files, *kwargs)
+        return self.load(files, presorted=True, **kwargs)
 
     def load_files_around_file(self, f, n=1, **kwargs):
         files, _ = self.find_files_around_file(f, n)
-        return self.load(files, *kwargs)
+        return self.load(files, presorted=True, **kwargs)
 
 class MCSL22dLoader(L22dDataPathHandler, MCSL22dReader):
-    def __init__(self, mcs_data_path):
+    def __init__(self, mcs_data_path, use_cache=False, max_workers=MAX_READ_WORKERS):
+        """
+        use_cache: keep parquet copies of each DDR read next to the L2 files
+        and read from them when they exist
+        max_workers: max threads used to read files concurrently
+        """
         super().__init__(mcs_data_path)
+        self.use_cache = use_cache
+        self.max_workers = max_workers
     
     def load_single(self, filename, ddr):
+        """
+        Read a single file with a separate reader, since reading
+        sets file-specific attributes. Allows files to be read concurrently.
+        Missing files give an empty DataFrame.
+        """
+        reader = MCSL22dReader()
         try:
-            data = self.read(filename, ddr=ddr)
+            if self.use_cache:
+                return reader.read_cached(filename, ddr=ddr)
+            return reader.read(filename, ddr=ddr)
         except FileNotFoundError:
-            data = self.make_empty_df()
-        self.data[ddr] = data
-        return data
+            return self.make_empty_df(ddr)
 
-    def reduce_to_profiles(self, data, profiles):
-        return pd.merge(data, profiles, on=["Prof#", "filename"])
+    def load_single_ddrs(self, filename, ddrs):
+        """
+        Read several DDRs from a single file with a separate reader
+        (see ``load_single``). None if the file doesn't exist.
+        """
+        try:
+            return MCSL22dReader().read_ddrs(filename, ddrs=ddrs)
+        except FileNotFoundError:
+            return None
 
-    def load(self, files, ddr, profiles=[]):
-        if type(files) != list:
-            data = self.load_single(files, ddr)
-            if len(profiles)== 0:
-                return data
-            else:
-                self.reduce_to_profiles([data], profiles)
-        elif len(files) == 0:
-            return self.make_empty_df(ddr)
+    def all_cached(self, files, ddr):
+        """
+        Check if every file has a parquet copy of this DDR
+        """
+        return all(os.path.exists(self.cache_path(f, ddr)) for f in files)
+
+    def profile_filter(self, profiles):
+        """
+        Parquet filter keeping rows from the requested profile numbers
+        and files, so other rows are skipped while reading.
+        Pairs are matched exactly afterwards by ``reduce_to_profiles``.
+        """
+        if len(profiles) == 0:
+            return None
+        prof_nums = profiles["Prof#"].unique().tolist()
+        filenames = profiles["filename"].unique().tolist()
+        return ds.field("Prof#").isin(prof_nums) & ds.field("filename").isin(filenames)
+
+    def files_with_profiles(self, files, profiles):
+        """
+        Keep only files that have any of the profiles,
+        so other files aren't read at all
+        """
+        filenames = set(profiles["filename"].unique())
+        return [
+            f for f in files if os.path.basename(f).split(".")[0] in filenames
+        ]
+
+    def profile_index(self, profiles):
+        """
+        Unique (Prof#, filename) pairs of profiles, to check membership in
+        """
+        return pd.MultiIndex.from_frame(profiles[self.profile_keys]).unique()
+
+    def reduce_to_profiles(self, data, profiles, profile_index=None):
+        """
+        Keep rows of data for profiles given by (Prof#, filename) pairs.
+        Any other columns of profiles are joined onto the data.
+        profile_index: pairs from ``profile_index``, when already built
+            (e.g. reducing several DDRs to the same profiles)
+        """
+        keys = self.profile_keys
+        if len(profiles.columns.difference(keys)) > 0:
+            data = data.join(profiles.set_index(keys), on=keys, how="inner")
+            return data.reset_index(drop=True)
+        # only selecting rows, so just check membership in
+        # the unique pairs (hashed once for the whole load)
+        if profile_index is None:
+            profile_index = self.profile_index(profiles)
+        in_profiles = pd.MultiIndex.from_frame(data[keys]).isin(profile_index)
+        return data[in_profiles].reset_index(drop=True)
+
+    def load(self, files, ddr, profiles=[], columns=None):
+        """
+        Load a DDR from one or more L2 files.
+
+        Parameters
+        ----------
+        files: filename or list of filenames
+        ddr: data record to load [DDR1 - DDR4]
+        profiles: (Prof#, filename) pairs to keep (all if empty)
+        columns: DDR columns to keep (all if not specified),
+            Prof#/filename/level are always kept
+
+        Returns
+        -------
+        data: loaded data
+        """
+        files = as_file_list(files)
+        if len(profiles) > 0:
+            files = self.files_with_profiles(files, profiles)
+        if columns is not None:
+            columns = list(columns) + [
+                x for x in self.profile_columns if x not in columns
+            ]
+        if len(files) == 0:
+            data = self.make_empty_df(ddr)
+        elif self.use_cache and self.all_cached(files, ddr):
+            # read all parquet copies at once, only the needed columns.
+            # Copies are cast to the read schema (not the first file's),
+            # so they match parsed files whatever dtypes they were written with
+            cached = [self.cache_path(f, ddr) for f in files]
+            dtypes = self.dtypes(ddr)
+            schema = pa.Schema.from_pandas(
+                self.make_empty_df(ddr), preserve_index=False
+            )
+            data = (
+                ds.dataset(cached, format="parquet", schema=schema)
+                .to_table(columns=columns, filter=self.profile_filter(profiles))
+                .to_pandas()
+            )
+            data = data.astype({x: dtypes[x] for x in data.columns})
         else:
-            dfs = [self.read(f) for f in files]
-            if len(profiles)>0:
-                dfs = [self.reduce_to_profiles(df) for df in dfs]
-            return pd.concat(dfs)
-
-    def load_date_range(self, start_time, end_time, ddr="DDR1", profiles=[]):
-        print(f"Loading L2 {ddr} data from {start_time} - {end_time}")
-        files = self.DPH.find_files_from_daterange(start_time, end_time)[0]
-        data = self.load_L2(files, ddr, profiles=profiles)
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(files))
+            ) as ex:
+                dfs = list(ex.map(lambda f: self.load_single(f, ddr), files))
+            data = concat_frames(dfs)
+            del dfs  # free per-file frames before selecting columns/profiles
+        if len(profiles) == 0:
+            data = categorize_filenames(data)
+            return data if columns is None else data[columns]
+        if columns is not None:
+            data = data[columns]
+        # single merge over all files rather than one per file
+        return categorize_filenames(self.reduce_to_profiles(data, profiles))
+
+    def load_ddrs(self, files, ddrs=("DDR1", "DDR2"), profiles=[]) -> dict:
+        """
+        Load several DDRs from L2 files, reading each file only once
+        (rather than once per DDR with ``load``). Doesn't use the cache.
+
+        Parameters
+        ----------
+        files: filename or list of filenames
+        ddrs: data records to load [DDR1 - DDR4]
+        profiles: (Prof#, filename) pairs to keep (all if empty)
+
+        Returns
+        -------
+        data: loaded data for each DDR
+        """
+        files = as_file_list(files)
+        if len(profiles) > 0:
+            files = self.files_with_profiles(files, profiles)
+        results = []
+        if files:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(files))
+            ) as ex:
+                results = list(ex.map(lambda f: self.load_single_ddrs(f, ddrs), files))
+        results = [x for x in results if x is not None]
+        # same profiles for every DDR, so only hash them once
+        profile_index = self.profile_index(profiles) if len(profiles) > 0 else None
+        data = {}
+        for ddr in ddrs:
+            if not results:
+                data[ddr] = categorize_filenames(self.make_empty_df(ddr))
+                continue
+            data[ddr] = concat_frames([x[ddr] for x in results])
+            if len(profiles) > 0:
+                data[ddr] = self.reduce_to_profiles(
+                    data[ddr], profiles, profile_index
+                )
+            data[ddr] = categorize_filenames(data[ddr])
+        return data
+
+    def load_date_range(
+        self, start_time, end_time, ddr="DDR1", profiles=[], columns=None
+    ):
+        if end_time <= start_time:
+            # empty range, no files to look for
+            return self.load([], ddr, columns=columns)
+        logger.info("Loading L2 %s data from %s - %s", ddr, start_time, end_time)
+        files = self.find_files_from_daterange(start_time, end_time)[0]
+        data = self.load(files, ddr, profiles=profiles, columns=columns)
         return data
 
+    def load_from_datetimes(self, datetimes, ddr="DDR1", **kwargs):
+        """
+        Load L2 files containing any of the given datetimes
+        (each file found once, see ``find_files_from_datetimes``)
+        """
+        files, _ = self.find_files_from_datetimes(datetimes)
+        return self.load(files, ddr, **kwargs)
+
     def load_ls_range(
         self, my: int, start_ls: float, end_ls: float, **kwargs
     ) -> pd.DataFrame:
@@ -88,9 +429,11 @@ class MCSL22dLoader(L22dDataPathHandler, MCSL22dReader):
         -------
         _: loaded L2 data
         """
-        print(
-            f"Determining approximate start/end dates for MY{my}, "
-            f"Ls range: {start_ls} - {end_ls}"
+        logger.info(
+            "Determining approximate start/end dates for MY%s, Ls range: %s - %s",
+            my,
+            start_ls,
+            end_ls,
         )
         date_start = mt.MY_Ls_to_UTC(my, start_ls)
         date_end = mt.MY_Ls_to_UTC(my, end_ls)
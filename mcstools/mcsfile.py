@@ -1,3 +1,5 @@
+import itertools
+
 import numpy as np
 
 
@@ -18,13 +20,13 @@ class MCSL1BFile(MCSFile):
 
     file_suffix = "L1B"
     ndetectors = 21  # number of detectors
-    detector_range = np.arange(1, ndetectors + 1, 1)
+    detector_range = np.arange(1, ndetectors + 1, dtype=np.int8)
     # Detector numbers incresae in altitude for B channels, decrease in A
-    detectors = {"A": np.flipud(detector_range), "B": detector_range}
+    detectors = {"A": detector_range[::-1], "B": detector_range}
     # Channel names
     channels = [f"A{x}" for x in range(1, 7)] + [f"B{x}" for x in range(1, 4)]
     # column names L1B file
-    columns = [
+    columns = (
         "1",
         "Date",
         "UTC",
@@ -96,200 +98,25 @@ class MCSL1BFile(MCSFile):
         "Solar_base_temp",
         "+5V",
         "Rqual",
-        "Rad_A1_01",
-        "Rad_A1_02",
-        "Rad_A1_03",
-        "Rad_A1_04",
-        "Rad_A1_05",
-        "Rad_A1_06",
-        "Rad_A1_07",
-        "Rad_A1_08",
-        "Rad_A1_09",
-        "Rad_A1_10",
-        "Rad_A1_11",
-        "Rad_A1_12",
-        "Rad_A1_13",
-        "Rad_A1_14",
-        "Rad_A1_15",
-        "Rad_A1_16",
-        "Rad_A1_17",
-        "Rad_A1_18",
-        "Rad_A1_19",
-        "Rad_A1_20",
-        "Rad_A1_21",
-        "Rad_A2_01",
-        "Rad_A2_02",
-        "Rad_A2_03",
-        "Rad_A2_04",
-        "Rad_A2_05",
-        "Rad_A2_06",
-        "Rad_A2_07",
-        "Rad_A2_08",
-        "Rad_A2_09",
-        "Rad_A2_10",
-        "Rad_A2_11",
-        "Rad_A2_12",
-        "Rad_A2_13",
-        "Rad_A2_14",
-        "Rad_A2_15",
-        "Rad_A2_16",
-        "Rad_A2_17",
-        "Rad_A2_18",
-        "Rad_A2_19",
-        "Rad_A2_20",
-        "Rad_A2_21",
-        "Rad_A3_01",
-        "Rad_A3_02",
-        "Rad_A3_03",
-        "Rad_A3_04",
-        "Rad_A3_05",
-        "Rad_A3_06",
-        "Rad_A3_07",
-        "Rad_A3_08",
-        "Rad_A3_09",
-        "Rad_A3_10",
-        "Rad_A3_11",
-        "Rad_A3_12",
-        "Rad_A3_13",
-        "Rad_A3_14",
-        "Rad_A3_15",
-        "Rad_A3_16",
-        "Rad_A3_17",
-        "Rad_A3_18",
-        "Rad_A3_19",
-        "Rad_A3_20",
-        "Rad_A3_21",
-        "Rad_A4_01",
-        "Rad_A4_02",
-        "Rad_A4_03",
-        "Rad_A4_04",
-        "Rad_A4_05",
-        "Rad_A4_06",
-        "Rad_A4_07",
-        "Rad_A4_08",
-        "Rad_A4_09",
-        "Rad_A4_10",
-        "Rad_A4_11",
-        "Rad_A4_12",
-        "Rad_A4_13",
-        "Rad_A4_14",
-        "Rad_A4_15",
-        "Rad_A4_16",
-        "Rad_A4_17",
-        "Rad_A4_18",
-        "Rad_A4_19",
-        "Rad_A4_20",
-        "Rad_A4_21",
-        "Rad_A5_01",
-        "Rad_A5_02",
-        "Rad_A5_03",
-        "Rad_A5_04",
-        "Rad_A5_05",
-        "Rad_A5_06",
-        "Rad_A5_07",
-        "Rad_A5_08",
-        "Rad_A5_09",
-        "Rad_A5_10",
-        "Rad_A5_11",
-        "Rad_A5_12",
-        "Rad_A5_13",
-        "Rad_A5_14",
-        "Rad_A5_15",
-        "Rad_A5_16",
-        "Rad_A5_17",
-        "Rad_A5_18",
-        "Rad_A5_19",
-        "Rad_A5_20",
-        "Rad_A5_21",
-        "Rad_A6_01",
-        "Rad_A6_02",
-        "Rad_A6_03",
-        "Rad_A6_04",
-        "Rad_A6_05",
-        "Rad_A6_06",
-        "Rad_A6_07",
-        "Rad_A6_08",
-        "Rad_A6_09",
-        "Rad_A6_10",
-        "Rad_A6_11",
-        "Rad_A6_12",
-        "Rad_A6_13",
-        "Rad_A6_14",
-        "Rad_A6_15",
-        "Rad_A6_16",
-        "Rad_A6_17",
-        "Rad_A6_18",
-        "Rad_A6_19",
-        "Rad_A6_20",
-        "Rad_A6_21",
-        "Rad_B1_01",
-        "Rad_B1_02",
-        "Rad_B1_03",
-        "Rad_B1_04",
-        "Rad_B1_05",
-        "Rad_B1_06",
-        "Rad_B1_07",
-        "Rad_B1_08",
-        "Rad_B1_09",
-        "Rad_B1_10",
-        "Rad_B1_11",
-        "Rad_B1_12",
-        "Rad_B1_13",
-        "Rad_B1_14",
-        "Rad_B1_15",
-        "Rad_B1_16",
-        "Rad_B1_17",
-        "Rad_B1_18",
-        "Rad_B1_19",
-        "Rad_B1_20",
-        "Rad_B1_21",
-        "Rad_B2_01",
-        "Rad_B2_02",
-        "Rad_B2_03",
-        "Rad_B2_04",
-        "Rad_B2_05",
-        "Rad_B2_06",
-        "Rad_B2_07",
-        "Rad_B2_08",
-        "Rad_B2_09",
-        "Rad_B2_10",
-        "Rad_B2_11",
-        "Rad_B2_12",
-        "Rad_B2_13",
-        "Rad_B2_14",
-        "Rad_B2_15",
-        "Rad_B2_16",
-        "Rad_B2_17",
-        "Rad_B2_18",
-        "Rad_B2_19",
-        "Rad_B2_20",
-        "Rad_B2_21",
-        "Rad_B3_01",
-        "Rad_B3_02",
-        "Rad_B3_03",
-        "Rad_B3_04",
-        "Rad_B3_05",
-        "Rad_B3_06",
-        "Rad_B3_07",
-        "Rad_B3_08",
-        "Rad_B3_09",
-        "Rad_B3_10",
-        "Rad_B3_11",
-        "Rad_B3_12",
-        "Rad_B3_13",
-        "Rad_B3_14",
-        "Rad_B3_15",
-        "Rad_B3_16",
-        "Rad_B3_17",
-        "Rad_B3_18",
-        "Rad_B3_19",
-        "Rad_B3_20",
-        "Rad_B3_21",
-    ]
+    ) + tuple(
+        # radiance columns, one per channel-detector (ex, "Rad_A6_11")
+        f"Rad_{ch}_{d:02d}"
+        for ch, d in itertools.product(channels, detector_range)
+    )
     comment_line_character = "#"
     nan_values = [-9999, ""]  # NAN values in data
-    radcols = [x for x in columns if "Rad_" in x]  # subset of Radiance columns
-    dtypes = {x: float for x in radcols}
+    # Radiance columns in file order (channel, then detector)
+    radcols_list = tuple(x for x in columns if x.startswith("Rad_"))
+    # same columns as a set, for membership checks only (not ordered)
+    radcols = frozenset(radcols_list)
+    # text columns, all others are numeric
+    string_columns = frozenset(
+        ["Date", "UTC", "Mode", "Error_Detail", "Last_command_rec", "Req_ID"]
+    )
+    # float32 round-trips the ~6 significant digits written in the files
+    # (not exactly equal to the text values), at half the memory of float64
+    rad_dtype = np.float32
+    dtypes = dict.fromkeys(radcols_list, rad_dtype)
 
     def __init__(self):
         super().__init__()
@@ -319,6 +146,19 @@ class MCSL22dFile(MCSFile):
 
     file_suffix = "L2_2d"
     nan_values = [-9999, ""]  # values to treat as NaNs
+    placeholder_column = "1"  # leading column of every record, not loaded
+    # text columns (dates and times), all others are numeric
+    string_columns = frozenset(
+        ["Date", "UTC"] + [f"Ref_{x}_{i}" for x in ("Date", "UTC") for i in range(10)]
+    )
+    # science values have few significant digits, so use 32-bit dtypes
+    float_dtype = np.float32
+    int_dtype = np.int32
+    # large magnitudes that float32 can't resolve (SCLK ~1e9 s would be
+    # rounded to 64 s, Solar_dist ~2e8 km to 16 km), so kept as float64
+    precise_columns = frozenset(
+        ["SCLK", "Solar_dist"] + [f"Ref_SCLK_{i}" for i in range(10)]
+    )
     data_records = {
         "DDR1": {
             "lines": 1,
@@ -459,11 +299,51 @@ class MCSL22dFile(MCSFile):
             ],
         },
     }
+    # number of lines per profile (all records)
+    profile_lines = sum(record["lines"] for record in data_records.values())
+    # line of each record within a profile
+    record_offsets = dict(
+        zip(
+            data_records,
+            np.cumsum([0] + [x["lines"] for x in data_records.values()]).tolist(),
+        )
+    )
+    # position of each column within its record's lines
+    column_positions = {
+        ddr: {x: i for i, x in enumerate(record["columns"])}
+        for ddr, record in data_records.items()
+    }
+    # names of all columns in any record
+    all_DDR_names = frozenset(
+        itertools.chain.from_iterable(x["columns"] for x in data_records.values())
+    )
+    # integer columns (orbit and record numbers)
+    dtype_int = frozenset(["1", "Orb_num"])
+    # quality flags, integers but can be missing (-9999)
+    qual_columns = frozenset(x for x in all_DDR_names if "qual" in x)
+    qual_dtype = "Int32"  # nullable integer
 
     def __init__(self):
         super().__init__()
-        # set dtypes for making DFs
-        self.all_DDR_names = [
-            self.data_records[x]["columns"] for x in self.data_records.keys()
+
+    def column_dtype(self, column):
+        """
+        dtype of a DDR column in loaded data
+        """
+        if column in self.string_columns:
+            return str
+        if column in self.dtype_int:
+            return self.int_dtype
+        if column in self.qual_columns:
+            return self.qual_dtype
+        if column in self.precise_columns:
+            return np.float64
+        return self.float_dtype
+
+    def data_columns(self, ddr):
+        """
+        Columns of a DDR kept in loaded data (all but the placeholder)
+        """
+        return [
+            x for x in self.data_records[ddr]["columns"] if x != self.placeholder_column
         ]
-        self.dtype_int = ["1", "Orb_num"] + [x for x in self.all_DDR_names if "qual" in x]
@@ -1,9 +1,16 @@
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
 from mcsfile import MCSL1BFile, MCSL22dFile
 
+logger = logging.getLogger(__name__)
+
 # TODO: Refactor L22d class into same format as L1b
 
 
@@ -13,7 +20,7 @@ class MCSReader:
     """
 
     def __init__(self):
-        pass
+        super().__init__()
 
 
 class MCSL1BReader(MCSReader, MCSL1BFile):
@@ -21,9 +28,16 @@ class MCSL1BReader(MCSReader, MCSL1BFile):
     Class to read data from a *single* L1B file.
     """
 
+    # columns with values from the file header, and all loaded columns
+    header_columns = ["Solar_dist", "L_sub_s"]
+    output_columns = list(MCSL1BFile.columns) + header_columns
+    # arrow types of columns to fix when reading (others are inferred)
+    arrow_types = {
+        x: pa.from_numpy_dtype(MCSL1BFile.rad_dtype) for x in MCSL1BFile.radcols_list
+    }
+
     def __init__(self):
         super().__init__()
-        self.output_columns = self.columns + ["Solar_dist", "L_sub_s"]
 
     def read(self, filename, usecols=None, **kwargs):
         """
@@ -55,6 +69,157 @@ class MCSL1BReader(MCSReader, MCSL1BFile):
             df[newcol] = header_vals[newcol]
         return df
 
+    def empty_column_dtype(self, column):
+        """
+        dtype of column in frames without rows (numbers as floats)
+        """
+        if column in self.string_columns:
+            return str
+        if column in self.radcols:
+            return self.rad_dtype
+        return float
+
+    def make_empty_df(self, usecols=None) -> pd.DataFrame:
+        """
+        DataFrame with no rows, with the output columns (only usecols
+        and header values, if given) and the dtypes of read data
+        (numbers as floats)
+        """
+        columns = self.output_columns
+        if usecols:
+            keep = set(usecols).union(self.header_columns)
+            columns = [x for x in columns if x in keep]
+        return pd.DataFrame(
+            {
+                x: pd.Series(dtype=self.empty_column_dtype(x))
+                for x in columns
+            }
+        )
+
+    def count_comment_lines(self, filename: str) -> int:
+        """
+        Count comment lines at the top of a file
+        """
+        n = 0
+        with open(filename, "r") as f:
+            for line in f:
+                if not line.startswith(self.comment_line_character):
+                    break
+                n += 1
+        return n
+
+    def read_table(self, filename: str, usecols=None) -> pa.Table:
+        """
+        Read data columns of L1B file into an Arrow table (no header values
+        or NaN replacement). Tables from many files can be combined and
+        converted to pandas once, see ``read_many``.
+        Only columns in usecols are parsed (all if not given).
+        """
+        if usecols:
+            # keep file order, as read_csv does (set for O(1) lookups,
+            # L1B files have 260 columns)
+            keep = set(usecols)
+            usecols = [x for x in self.columns if x in keep]
+        # skip comments and the line of column names
+        skip_rows = self.count_comment_lines(filename) + 1
+        return pcsv.read_csv(
+            filename,
+            read_options=pcsv.ReadOptions(
+                skip_rows=skip_rows, column_names=self.columns
+            ),
+            convert_options=pcsv.ConvertOptions(
+                column_types=self.arrow_types, include_columns=usecols
+            ),
+        )
+
+    def replace_nan_values(self, table: pa.Table) -> pa.Table:
+        """
+        Set NaN values in float columns to null (NaN in pandas).
+        Like ``read``, integer columns are left as is.
+        """
+        nan_values = [x for x in self.nan_values if not isinstance(x, str)]
+        for i, field in enumerate(table.schema):
+            if not pa.types.is_floating(field.type):
+                continue
+            column = table.column(i)
+            is_nan = pc.is_in(column, value_set=pa.array(nan_values, field.type))
+            if pc.any(is_nan).as_py():
+                column = pc.if_else(is_nan, pa.scalar(None, field.type), column)
+                table = table.set_column(i, field, column)
+        return table
+
+    def unify_column_types(self, tables: list) -> list:
+        """
+        Cast columns whose types were inferred differently between
+        files (e.g. all-NaN in one, int in one and float in another)
+        to a shared type so the tables can be combined.
+        """
+        fields = []
+        for i, field in enumerate(tables[0].schema):
+            types = {t.schema.field(i).type for t in tables}
+            if len(types) > 1:
+                types.discard(pa.null())
+            if len(types) == 1:
+                fields.append(field.with_type(types.pop()))
+            elif all(pa.types.is_integer(x) or pa.types.is_floating(x) for x in types):
+                fields.append(field.with_type(pa.float64()))
+            else:
+                fields.append(field.with_type(pa.string()))
+        schema = pa.schema(fields)
+        return [t if t.schema.equals(schema) else t.cast(schema) for t in tables]
+
+    def read_file_table(self, filename: str, usecols=None):
+        """
+        Read Arrow table (NaN values replaced) and header values of file,
+        None if it doesn't exist (skipped when reading many files)
+        """
+        try:
+            table = self.read_table(filename, usecols=usecols)
+        except FileNotFoundError:
+            return None
+        return self.replace_nan_values(table), self.grab_header_values(filename)
+
+    def read_many(self, files: list, usecols=None, max_workers=1) -> pd.DataFrame:
+        """
+        Read several L1B files, combining them as Arrow tables
+        and converting to pandas once. Missing files are skipped.
+
+        Parameters
+        ----------
+        files: names of files to load data from, in order
+        usecols: columns to read (all if not specified)
+        max_workers: number of threads reading files concurrently
+
+        Returns
+        -------
+        df (DF): Data from all files as pandas DataFrame
+        """
+        if max_workers > 1 and len(files) > 1:
+            # reads are I/O bound and arrow releases the GIL, so use threads
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as ex:
+                results = list(
+                    ex.map(lambda f: self.read_file_table(f, usecols=usecols), files)
+                )
+        else:
+            results = [self.read_file_table(f, usecols=usecols) for f in files]
+        results = [x for x in results if x is not None]
+        tables = [table for table, _ in results]
+        header_vals = [vals for _, vals in results]
+        if not tables:
+            return self.make_empty_df(usecols=usecols)
+        nrows = [t.num_rows for t in tables]
+        if len(tables) == 1:
+            table = tables[0]  # nothing to combine
+        else:
+            table = pa.concat_tables(self.unify_column_types(tables))
+        del tables, results  # combined table holds the only references to the data
+        # combining tables doesn't copy, and the conversion frees arrow memory
+        # as it goes
+        df = table.to_pandas(self_destruct=True)
+        for newcol in header_vals[0].keys():
+            df[newcol] = np.repeat([x[newcol] for x in header_vals], nrows)
+        return df
+
     def grab_header_values(self, filename: str) -> dict:
         """
         Open file and grab certain values from header.
@@ -68,7 +233,7 @@ class MCSL1BReader(MCSReader, MCSL1BFile):
         -------
         vals: dictionary of header values
         """
-        vals = {"Solar_dist": None, "L_sub_s": None}
+        vals = dict.fromkeys(self.header_columns)
         with open(filename, "r") as f:
             for i in range(0, 40):
                 line = f.readline()
@@ -88,6 +253,10 @@ class MCSL1BReader(MCSReader, MCSL1BFile):
 
 
 class MCSL22dReader(MCSReader, MCSL22dFile):
+    # columns added to each DDR's data when read
+    profile_columns = ["Prof#", "filename", "level"]
+    profile_keys = ["Prof#", "filename"]  # identify a profile across files
+
     def __init__(self):
         """
         Class with MCS L2_2d file information and methods
@@ -130,9 +299,8 @@ class MCSL22dReader(MCSReader, MCSL22dFile):
         -------
         names (list): list of name items in line
         """
-        # ddrs = len(self.data_records.keys())
         file_columns = {}
-        for i, ddr in enumerate(self.data_records.keys()):
+        for i, ddr in enumerate(self.data_records):
             ddr_line = lines[len(self.comments) + i]
             file_columns[ddr] = [x.strip() for x in ddr_line.rstrip().split(",")]
             self.check_column_names(file_columns[ddr], ddr)
@@ -152,12 +320,15 @@ class MCSL22dReader(MCSReader, MCSL22dFile):
         """
         exp_cols = self.data_records[DDRN]["columns"]
         if column_names != exp_cols:
-            print(
-                f"{DDRN} column names given in {self.filename} do not match expected."
+            logger.warning(
+                "%s column names given in %s do not match expected.\n"
+                "Expected %s names for %s row,\nGot: %s",
+                DDRN,
+                self.filename,
+                exp_cols,
+                DDRN,
+                column_names,
             )
-            print(f"Filename: {self.filename}")
-            print(f"Expected {exp_cols} names for DDR{DDRN} row,")
-            print(f"Got: {column_names}")
 
     def get_data_record(self, lines, record):
         """
@@ -172,30 +343,19 @@ class MCSL22dReader(MCSReader, MCSL22dFile):
         data (list): nested list of data for each profile in given data record
         """
         len_com = len(self.comments)  # number of comment lines to skip
-        len_colnames = len(
-            self.data_records.keys()
-        )  # number of column-name lines to skip
-        # number of rows for first profile up to this data record
-        skip_data_rows = np.sum(
-            [self.data_records[x]["lines"] for x in self.data_records.keys()][
-                0 : int(record[-1]) - 1
-            ]
-        )
+        len_colnames = len(self.data_records)  # number of column-name lines to skip
         start_row = (
-            len_com + len_colnames + int(skip_data_rows)
+            len_com + len_colnames + self.record_offsets[record]
         )  # row of file to start recording data
         # number of rows per profile
-        rows_per_prof = np.sum(
-            [self.data_records[x]["lines"] for x in self.data_records.keys()]
-        )
+        rows_per_prof = self.profile_lines
         chunk_size = self.data_records[record][
             "lines"
         ]  # number of lines per profile for this record
         # Get lines for this record over whole file
         rows = [
             lines[i : i + chunk_size]
-            for i in range(start_row, self.file_length + 1)
-            if (i - start_row) % rows_per_prof == 0
+            for i in range(start_row, self.file_length + 1, rows_per_prof)
         ]
         rows_items = [
             x.rstrip().split(",") for sublist in rows for x in sublist
@@ -221,24 +381,19 @@ class MCSL22dReader(MCSReader, MCSL22dFile):
         data = {}  # initialize data dict
         # Gather number of lines for parts of file
         len_com = len(self.comments)  # number of comment lines to skip
-        len_colnames = len(
-            self.data_records.keys()
-        )  # number of column-name lines to skip
+        len_colnames = len(self.data_records)  # number of column-name lines to skip
         start_row = len_com + len_colnames  # first row of data
         # number of rows per profile
-        rows_per_prof = np.sum(
-            [self.data_records[x]["lines"] for x in self.data_records.keys()]
-        )
+        rows_per_prof = self.profile_lines
         # Get data from each record
-        for i, ddr in enumerate(self.data_records.keys()):
+        for ddr in self.data_records:
             chunk_size = self.data_records[ddr][
                 "lines"
             ]  # number of lines per profile for this record
             # Get lines for this record over whole file
             rows = [
                 lines[i : i + chunk_size]
-                for i in range(start_row, self.file_length + 1)
-                if (i - start_row) % rows_per_prof == 0
+                for i in range(start_row, self.file_length + 1, rows_per_prof)
             ]
             rows_items = [
                 x.rstrip().split(",") for sublist in rows for x in sublist
@@ -266,16 +421,14 @@ class MCSL22dReader(MCSReader, MCSL22dFile):
         -------
         (DF): Data as pandas DataFrame
         """
-        col_index = [self.data_records[record]["columns"].index(x) for x in columns]
+        positions = self.column_positions[record]
+        col_index = [positions[x] for x in columns]
         inp_data = [[sublist[i] for i in col_index] for sublist in data]
-        # getting FutureWarning with float here,should make dict of dtypes in mcsfile.py
-        df = pd.DataFrame(data=inp_data, columns=columns, dtype=float)
-        df.replace(self.nan_values, np.nan, inplace=True)
-        # convert dtype of columns that should be integers
-        int_cols = [x for x in df.columns if x in self.dtype_int]
-        for col in int_cols:
-            df[col] = df[col].astype(int)
-        return df
+        df = pd.DataFrame(data=inp_data, columns=columns)
+        numeric = [x for x in columns if x not in self.string_columns]
+        # parse numbers as float first, so NaN values can be replaced
+        df[numeric] = df[numeric].astype(float).replace(self.nan_values, np.nan)
+        return df.astype({x: self.column_dtype(x) for x in columns})
 
     def add_profile_filename_number(self, df, record):
         """
@@ -306,17 +459,67 @@ class MCSL22dReader(MCSReader, MCSL22dFile):
         return path
 
     def read(self, filename, ddr="DDR2"):
+        return self.read_ddrs(filename, ddrs=[ddr])[ddr]
+
+    def read_ddrs(self, filename, ddrs=("DDR1", "DDR2")) -> dict:
+        """
+        Read several DDRs from a file, reading and splitting its lines once
+
+        Parameters
+        ----------
+        filename (str): name of file to load data from
+        ddrs (list): DDRs to read [DDR1 - DDR4]
+
+        Returns
+        -------
+        dfs (dict): DDR data as pandas DataFrame for each DDR
+        """
         lines = self.read_lines_from_file(filename)
         self.get_comments_from_lines(lines)
         self.get_column_names_from_lines(lines)
-        data = self.get_data_record(lines, ddr)
-        df = self.make_df(data, ddr, self.data_records[ddr]["columns"])
-        df = self.add_profile_filename_number(df, ddr)
+        dfs = {}
+        for ddr in ddrs:
+            data = self.get_data_record(lines, ddr)
+            df = self.make_df(data, ddr, self.data_columns(ddr))
+            dfs[ddr] = self.add_profile_filename_number(df, ddr)
+        return dfs
+
+    def cache_path(self, filename, ddr):
+        """
+        Path of parquet copy of a DDR from an L2 file
+        """
+        return f"{filename}.{ddr}.parquet"
+
+    def read_cached(self, filename, ddr="DDR2"):
+        """
+        Read DDR data from parquet copy of file if it exists,
+        otherwise read the L2 file and write the parquet copy
+        so the next read skips parsing text.
+        """
+        cache = self.cache_path(filename, ddr)
+        if os.path.exists(cache):
+            # match parsed files exactly (e.g. copies written with other
+            # dtypes), so concatenating them needs no dtype reconciliation
+            return pd.read_parquet(cache).astype(self.dtypes(ddr))
+        df = self.read(filename, ddr=ddr)
+        try:
+            df.to_parquet(cache, index=False)
+        except OSError:
+            pass  # e.g. read-only data directory, just don't cache
         return df
 
+    def dtypes(self, ddr):
+        """
+        dtypes of each column of read data for a DDR
+        """
+        dtypes = {x: self.column_dtype(x) for x in self.data_columns(ddr)}
+        dtypes.update({"Prof#": int, "filename": str, "level": int})
+        return dtypes
+
     def make_empty_df(self, ddr):
-        data = pd.DataFrame(
-            data=[], columns=self.data_records[ddr]["columns"]
+        """
+        DataFrame with no rows, with the columns and dtypes of read data
+        """
+        return pd.DataFrame(
+            {x: pd.Series(dtype=d) for x, d in self.dtypes(ddr).items()}
         )
-        data = self.add_profile_filename_number(data, ddr)
-        return data
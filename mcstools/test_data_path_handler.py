@@ -0,0 +1,84 @@
+import datetime as dt
+import os
+
+import pandas as pd
+
+from data_path_handler import L1BDataPathHandler
+
+
+def test_check_for_files(l1b_path_handler):
+    level_dir = l1b_path_handler.level_directory
+    exists = os.path.join(level_dir, "1001", "100101040000.L1B")
+    missing = os.path.join(level_dir, "1001", "100101080000.L1B")
+    missing_dir = os.path.join(level_dir, "1002", "100201000000.L1B")
+    paths, dont_exist = l1b_path_handler.check_for_files(
+        [exists, missing, missing_dir]
+    )
+    assert paths == [exists]
+    assert dont_exist == [missing, missing_dir]
+
+
+def test_build_date_path(l1b_path_handler):
+    date = dt.datetime(2010, 1, 1, 7, 59)
+    expected = os.path.join(
+        l1b_path_handler.level_directory, "1001", "100101040000.L1B"
+    )
+    assert l1b_path_handler.build_date_path(date) == expected
+    assert l1b_path_handler.find_file_from_date(date) == (expected, [])
+
+
+def test_build_paths_from_datetimes(l1b_path_handler):
+    datetimes = pd.DatetimeIndex(["2010-01-31 20:00", "2010-02-01 00:00"])
+    level_dir = l1b_path_handler.level_directory
+    assert l1b_path_handler.build_paths_from_datetimes(datetimes) == [
+        os.path.join(level_dir, "1001", "100131200000.L1B"),
+        os.path.join(level_dir, "1002", "100201000000.L1B"),
+    ]
+
+
+def test_check_for_files_problem_files(l1b_path_handler):
+    problem_dir = os.path.join(l1b_path_handler.level_directory, "1508")
+    os.mkdir(problem_dir)
+    problem = os.path.join(problem_dir, "150826040000.L1B")
+    open(problem, "w").close()
+    assert l1b_path_handler.check_for_files([problem]) == ([], [])
+
+
+def test_path_to_filedt(l1b_path_handler):
+    path = os.path.join(l1b_path_handler.level_directory, "1508", "150826040000.L1B")
+    assert l1b_path_handler.path_to_filedt(path) == dt.datetime(2015, 8, 26, 4)
+
+
+def test_find_files_around_date(l1b_path_handler):
+    date = dt.datetime(2010, 1, 1, 5)
+    files, missing = l1b_path_handler.find_files_around_date(date, 1)
+    assert [os.path.basename(f) for f in files] == ["100101040000.L1B"]
+    assert [os.path.basename(f) for f in missing] == [
+        "100101000000.L1B",
+        "100101080000.L1B",
+    ]
+    assert l1b_path_handler.find_files_around_date(date, 0) == (files, [])
+
+
+def test_check_for_files_remote():
+    handler = L1BDataPathHandler("https://example.com/mcs")
+    paths = handler.build_paths_from_daterange(
+        dt.datetime(2010, 1, 1), dt.datetime(2010, 1, 1, 5)
+    )
+    assert len(paths) == 2
+    assert handler.check_for_files(paths) == (paths, [])
+
+
+def test_filedt_to_filestr(l1b_path_handler):
+    fdt = dt.datetime(2015, 8, 26, 4, 5, 6)
+    assert l1b_path_handler.filedt_to_filestr(fdt) == "150826040506"
+    assert l1b_path_handler.filestr_to_filedt("150826040506") == fdt
+
+
+def test_find_files_from_datetimes(l1b_path_handler):
+    datetimes = pd.Series(
+        pd.to_datetime(["2010-01-01 08:30", "2010-01-01 05:00", "2010-01-01 07:59"])
+    )
+    files, missing = l1b_path_handler.find_files_from_datetimes(datetimes)
+    assert [os.path.basename(f) for f in files] == ["100101040000.L1B"]
+    assert [os.path.basename(f) for f in missing] == ["100101080000.L1B"]
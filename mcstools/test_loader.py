@@ -0,0 +1,286 @@
+import datetime as dt
+import os
+
+import dask.dataframe as dd
+import pandas as pd
+import pyarrow as pa
+from util.mars_time import dt_to_MY_Ls
+
+from loader import MCSL22dLoader
+
+
+def test_load_l1b_files(l1b_loader):
+    data = l1b_loader.load(["test/top.L1B", "test/top.L1B"])
+    assert data.shape == (10, 262)
+    assert data["Rad_B3_21"].dtype == "float32"
+    assert data.index.to_list() == list(range(10))
+
+
+def test_load_l22d_files(l22d_loader, l22d_path):
+    data = l22d_loader.load([l22d_path, l22d_path], "DDR2")
+    assert data.shape == (2 * 2 * 105, 14 + 3)
+    assert data["filename"].unique().tolist() == ["100101000000"]
+
+
+def test_load_l22d_profiles(l22d_loader, l22d_path):
+    profiles = pd.DataFrame({"Prof#": [1], "filename": ["100101000000"]})
+    data = l22d_loader.load(l22d_path, "DDR2", profiles=profiles)
+    assert data.shape == (105, 14 + 3)
+    assert (data["Prof#"] == 1).all()
+
+
+def test_load_l22d_missing(l22d_loader):
+    data = l22d_loader.load("missing.L2", "DDR2")
+    assert len(data) == 0
+    assert "Prof#" in data.columns
+
+
+def test_load_l1b_single_file(l1b_loader):
+    data = l1b_loader.load("test/top.L1B")
+    assert data.shape == (5, 262)
+    assert l1b_loader.load(("test/top.L1B",)).shape == (5, 262)
+
+
+def test_load_l1b_files_dask(l1b_loader):
+    files = ["test/top.L1B"] * 3
+    data = l1b_loader.load(files, dask=True, files_per_partition=2)
+    assert data.npartitions == 2
+    assert data.compute().shape == (15, 262)
+    assert isinstance(l1b_loader.load([], dask=True), dd.DataFrame)
+
+
+def test_load_l1b_dask_meta_reads_one_file(l1b_loader, monkeypatch):
+    read_file_table = l1b_loader.read_file_table
+    reads = []
+
+    def spy(filename, *args, **kwargs):
+        reads.append(filename)
+        return read_file_table(filename, *args, **kwargs)
+
+    monkeypatch.setattr(l1b_loader, "read_file_table", spy)
+    data = l1b_loader.load(["test/top.L1B"] * 3, dask=True, files_per_partition=3)
+    assert len(reads) == 1
+    assert data.dtypes.to_dict() == data.compute().dtypes.to_dict()
+
+
+def test_load_l22d_cached(l22d_cache_loader, l22d_path):
+    files = [l22d_path]
+    first = l22d_cache_loader.load(files, "DDR2")
+    assert l22d_cache_loader.all_cached(files, "DDR2")
+    cached = l22d_cache_loader.load(files, "DDR2")
+    pd.testing.assert_frame_equal(first, cached)
+
+
+def test_load_l22d_cached_dtypes(l22d_cache_loader, l22d_path):
+    first = l22d_cache_loader.load(l22d_path, "DDR2")
+    cache = l22d_cache_loader.cache_path(l22d_path, "DDR2")
+    # copy written with other dtypes, e.g. by an older version
+    pd.read_parquet(cache).astype({"T": float}).to_parquet(cache, index=False)
+    other = l22d_path.replace("100101000000", "100101040000")
+    os.symlink(l22d_path, other)
+    data = l22d_cache_loader.load([l22d_path, other], "DDR2")
+    assert data["T"].dtype == "float32"
+    # all cached, one copy float64 and one float32, read in either order
+    assert l22d_cache_loader.all_cached([l22d_path, other], "DDR2")
+    for files in [[l22d_path, other], [other, l22d_path]]:
+        cached = l22d_cache_loader.load(files, "DDR2")
+        assert cached.dtypes.to_dict() == data.dtypes.to_dict()
+    pd.testing.assert_frame_equal(
+        data.iloc[: len(first)].drop(columns="filename"),
+        first.drop(columns="filename"),
+    )
+
+
+def test_load_l1b_missing_file(l1b_loader):
+    data = l1b_loader.load(["missing.L1B", "test/top.L1B"])
+    assert data.shape == (5, 262)
+    assert len(l1b_loader.load(["missing.L1B"])) == 0
+
+
+def test_load_l22d_empty_date_range(l22d_loader):
+    date = dt.datetime(2010, 1, 1)
+    df = l22d_loader.load_date_range(date, date, ddr="DDR1")
+    assert df.empty
+    assert "Prof#" in df.columns
+
+
+def test_load_l1b_date_range(l1b_range_loader):
+    data = l1b_range_loader.load_date_range(
+        dt.datetime(2008, 12, 21, 20, 0, 2), dt.datetime(2008, 12, 21, 20, 0, 7)
+    )
+    assert data["SCLK"].to_list() == [914356822.752, 914356824.800, 914356826.848]
+    assert data.index.to_list() == [0, 1, 2]
+
+
+def test_load_l1b_empty_date_range(l1b_range_loader, monkeypatch):
+    def find_files(*args):
+        raise AssertionError("no files should be looked for")
+
+    monkeypatch.setattr(l1b_range_loader, "find_files_from_daterange", find_files)
+    date = dt.datetime(2008, 12, 21, 20)
+    for end in [date, date - dt.timedelta(hours=1)]:
+        data = l1b_range_loader.load_date_range(date, end)
+        assert data.empty
+        assert "dt" in data.columns
+        data = l1b_range_loader.load_date_range(date, end, dask=True)
+        assert isinstance(data, dd.DataFrame)
+        assert len(data.compute()) == 0
+
+
+def test_load_l1b_date_range_unsorted(l1b_range_loader, monkeypatch):
+    load = l1b_range_loader.load
+    monkeypatch.setattr(
+        l1b_range_loader, "load", lambda *a, **kw: load(*a, **kw)[::-1]
+    )
+    data = l1b_range_loader.load_date_range(
+        dt.datetime(2008, 12, 21, 20, 0, 2), dt.datetime(2008, 12, 21, 20, 0, 7)
+    )
+    assert data["SCLK"].to_list() == [914356822.752, 914356824.800, 914356826.848]
+
+
+def test_read_many_matches_read(l1b_reader):
+    expected = pd.concat([l1b_reader.read("test/top.L1B")] * 2, ignore_index=True)
+    data = l1b_reader.read_many(["test/top.L1B", "missing.L1B", "test/top.L1B"])
+    pd.testing.assert_frame_equal(data, expected)
+
+
+def test_load_l22d_cached_profiles(l22d_cache_loader, l22d_path):
+    profiles = pd.DataFrame({"Prof#": [1], "filename": ["100101000000"]})
+    l22d_cache_loader.load(l22d_path, "DDR2")  # write cache
+    data = l22d_cache_loader.load(l22d_path, "DDR2", profiles=profiles)
+    assert data.shape == (105, 14 + 3)
+    assert (data["Prof#"] == 1).all()
+
+
+def test_load_l1b_usecols(l1b_loader):
+    data = l1b_loader.load(["test/top.L1B"] * 2, usecols=["SCLK", "Date"])
+    assert data.columns.to_list() == ["Date", "SCLK", "Solar_dist", "L_sub_s"]
+    assert len(data) == 10
+
+
+def test_load_l22d_columns(l22d_cache_loader, l22d_path):
+    for _ in range(2):  # parsed, then from cache
+        data = l22d_cache_loader.load(l22d_path, "DDR2", columns=["Pres", "T"])
+        assert data.columns.to_list() == ["Pres", "T", "Prof#", "filename", "level"]
+
+
+def test_unify_column_types(l1b_reader):
+    tables = [
+        pa.table({"a": pa.array([1, 2]), "b": pa.array([None, None])}),
+        pa.table({"a": pa.array([0.5]), "b": pa.array(["x"])}),
+    ]
+    unified = l1b_reader.unify_column_types(tables)
+    assert pa.concat_tables(unified).column("a").to_pylist() == [1.0, 2.0, 0.5]
+    assert unified[0].schema.field("b").type == pa.string()
+
+
+def test_load_l1b_from_datetimes(l1b_range_loader):
+    datetimes = pd.to_datetime(["2008-12-21 21:00", "2008-12-21 22:00"])
+    assert l1b_range_loader.load_from_datetimes(datetimes).shape == (5, 262)
+
+
+def test_load_l22d_skips_files_without_profiles(l22d_loader, l22d_path):
+    profiles = pd.DataFrame({"Prof#": [0], "filename": ["100101000000"]})
+    files = l22d_loader.files_with_profiles(["other.L2", l22d_path], profiles)
+    assert files == [l22d_path]
+    data = l22d_loader.load(["other.L2", l22d_path], "DDR2", profiles=profiles)
+    assert (data["Prof#"] == 0).all()
+
+
+def test_load_l22d_profile_columns(l22d_loader, l22d_path):
+    profiles = pd.DataFrame(
+        {"Prof#": [1, 1], "filename": ["100101000000"] * 2, "label": ["a", "a"]}
+    )
+    data = l22d_loader.load(l22d_path, "DDR2", profiles=profiles.iloc[:1])
+    assert (data["label"] == "a").all()
+    assert isinstance(data["filename"].dtype, pd.CategoricalDtype)
+    data = l22d_loader.load(l22d_path, "DDR2", profiles=profiles[["Prof#", "filename"]])
+    assert len(data) == 105
+
+
+def test_load_l1b_ls_range(l1b_range_loader):
+    # test file rows are at MY29 Ls~177.8, converted dates are within minutes
+    my, ls = dt_to_MY_Ls(dt.datetime(2008, 12, 21, 20))
+    assert len(l1b_range_loader.load_ls_range(int(my), ls - 0.01, ls + 0.01)) == 5
+    assert len(l1b_range_loader.load_ls_range(int(my), ls + 0.01, ls + 0.05)) == 0
+    data = l1b_range_loader.load_ls_range(int(my), ls - 0.01, ls + 0.01, dask=True)
+    assert len(data.compute()) == 5
+
+
+def test_load_empty_dtypes(l1b_loader, l22d_loader):
+    data = l1b_loader.load([])
+    assert data.columns.to_list() == l1b_loader.output_columns
+    assert data["SCLK"].dtype == float
+    assert data["Rad_A1_01"].dtype == "float32"
+    assert data["Date"].dtype == l1b_loader.read("test/top.L1B")["Date"].dtype
+    assert l1b_loader.load(["missing.L1B"], usecols=["SCLK"]).columns.to_list() == [
+        "SCLK",
+        "Solar_dist",
+        "L_sub_s",
+    ]
+    data = l22d_loader.load([], "DDR2")
+    assert data["T"].dtype == "float32"
+    assert data["Prof#"].dtype == int
+
+
+def test_load_l22d_dtypes(l22d_loader, l22d_path):
+    data = l22d_loader.load(l22d_path, "DDR1")
+    assert data["Date"].to_list() == ["01-Jan-2010", "01-Jan-2010"]
+    assert data["Orb_num"].dtype == "int32"
+    assert data["T_qual"].dtype == "Int32"
+    assert data["L_s"].dtype == "float32"
+    assert data["SCLK"].dtype == "float64"
+    assert data["Ref_SCLK_9"].dtype == "float64"
+    assert l22d_loader.load(l22d_path, "DDR2")["T"].dtype == "float32"
+    assert isinstance(data["filename"].dtype, pd.CategoricalDtype)
+
+
+def test_load_l22d_missing_qual(l22d_loader, l22d_path):
+    with open(l22d_path) as f:
+        lines = f.read().splitlines()
+    i_qual = l22d_loader.data_records["DDR1"]["columns"].index("T_qual")
+    first_ddr1 = next(i for i, x in enumerate(lines) if "01-Jan-2010" in x)
+    values = lines[first_ddr1].split(", ")
+    values[i_qual] = "-9999"
+    lines[first_ddr1] = ", ".join(values)
+    with open(l22d_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    data = l22d_loader.load(l22d_path, "DDR1")
+    assert data["T_qual"].dtype == "Int32"
+    assert data["T_qual"].isna().to_list() == [True, False]
+
+
+def test_load_l22d_ddrs(l22d_loader, l22d_path):
+    data = l22d_loader.load_ddrs([l22d_path, "missing.L2"], ddrs=["DDR2", "DDR3"])
+    pd.testing.assert_frame_equal(data["DDR2"], l22d_loader.load(l22d_path, "DDR2"))
+    pd.testing.assert_frame_equal(data["DDR3"], l22d_loader.load(l22d_path, "DDR3"))
+    assert len(l22d_loader.load_ddrs([], ddrs=["DDR2"])["DDR2"]) == 0
+    profiles = pd.DataFrame({"Prof#": [1], "filename": ["100101000000"]})
+    data = l22d_loader.load_ddrs(l22d_path, ddrs=["DDR2", "DDR3"], profiles=profiles)
+    for ddr in ["DDR2", "DDR3"]:
+        pd.testing.assert_frame_equal(
+            data[ddr], l22d_loader.load(l22d_path, ddr, profiles=profiles)
+        )
+
+
+def test_load_l1b_date_range_dask(l1b_range_loader):
+    start = dt.datetime(2008, 12, 21, 20, 0, 2)
+    end = dt.datetime(2008, 12, 21, 20, 0, 7)
+    lazy = l1b_range_loader.load_date_range(start, end, dask=True)
+    expected = l1b_range_loader.load_date_range(start, end)
+    assert lazy.compute()["SCLK"].to_list() == expected["SCLK"].to_list()
+    assert lazy.dtypes.to_dict() == lazy.compute().dtypes.to_dict()
+    # partitions are copied, not modified
+    data = l1b_range_loader.load("test/top.L1B")
+    assert "dt" in l1b_range_loader.with_dt(data).columns
+    assert "dt" not in data.columns
+
+
+def test_load_l22d_from_datetimes(tmp_path, l22d_path):
+    level_dir = tmp_path / "level_2_2d" / "1001"
+    level_dir.mkdir(parents=True)
+    os.replace(l22d_path, level_dir / "100101000000.L2")
+    loader = MCSL22dLoader(str(tmp_path))
+    datetimes = pd.Series(pd.to_datetime(["2010-01-01 01:00", "2010-01-01 03:00"]))
+    data = loader.load_from_datetimes(datetimes, ddr="DDR2")
+    assert data.shape == (2 * 105, 14 + 3)
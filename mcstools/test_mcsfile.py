@@ -1,3 +1,10 @@
 def test_rad_names(l1b_file):
     assert l1b_file.make_rad_col_name("A2", 5) == "Rad_A2_05"
     assert "Rad_A2_05" in l1b_file.make_rad_col_names("A2")
+
+
+def test_radcols_order(l1b_file):
+    assert len(l1b_file.radcols_list) == len(l1b_file.channels) * l1b_file.ndetectors
+    assert l1b_file.radcols_list[:2] == ("Rad_A1_01", "Rad_A1_02")
+    assert l1b_file.radcols_list[-1] == "Rad_B3_21"
+    assert set(l1b_file.radcols_list) == l1b_file.radcols
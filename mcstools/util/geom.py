@@ -1,3 +1,6 @@
+import functools
+import math
+
 import numpy as np
 
 def spherical_coords_mcenter(radius: float, colat: float, lat: float) -> np.array:
@@ -7,20 +10,102 @@ def spherical_coords_mcenter(radius: float, colat: float, lat: float) -> np.arra
     return np.array([radius, colat, lat])
 
 
-def spherical_to_cartesian(spher_vec: np.array) -> np.array:
+def spherical_to_cartesian_soa(r, colat, lon, out: tuple = None) -> tuple:
+    """
+    Convert spherical coordinates to cartesian x, y, z
+    as separate arrays (one per coordinate).
+    Inputs can be scalars or arrays of any (broadcastable) shape,
+    e.g. DataFrame columns.
+
+    Parameters
+    ----------
+    r: radius
+    colat: colatitude [radians]
+    lon: longitude [radians]
+    out: optional tuple of three arrays (x, y, z) to write into
+
+    Returns
+    -------
+    x, y, z: cartesian coordinates
+    """
+    x, y, z = out if out is not None else (None, None, None)
+    # compute each trig term once
+    rsc = np.multiply(r, np.sin(colat))
+    x = np.multiply(rsc, np.cos(lon), out=x)
+    y = np.multiply(rsc, np.sin(lon), out=y)
+    z = np.multiply(r, np.cos(colat), out=z)
+    return x, y, z
+
+
+@functools.lru_cache(maxsize=32)
+def make_spherical_to_cartesian(r_const: float):
+    """
+    Build a version of ``spherical_to_cartesian_soa`` with a fixed radius
+    (e.g. Mars radius for a whole scan), cached by radius. The radius is
+    a scalar multiply, so no radius array is needed or broadcast.
+
+    Parameters
+    ----------
+    r_const: fixed radius
+
+    Returns
+    -------
+    _: function of (colat, lon, out=None) returning x, y, z
+    """
+
+    def spherical_to_cartesian_fixed_r(colat, lon, out: tuple = None) -> tuple:
+        x, y, z = out if out is not None else (None, None, None)
+        rsc = r_const * np.sin(colat)
+        x = np.multiply(rsc, np.cos(lon), out=x)
+        y = np.multiply(rsc, np.sin(lon), out=y)
+        z = np.multiply(r_const, np.cos(colat), out=z)
+        return x, y, z
+
+    return spherical_to_cartesian_fixed_r
+
+
+def spherical_to_cartesian(r, colat, lon, out: np.array = None) -> np.array:
     """
-    Convert vector in spherical coordinates to cartesian x, y, z.
+    Convert spherical coordinates to cartesian x, y, z.
+    Inputs can be scalars or arrays of any (broadcastable) shape.
+
+    Parameters
+    ----------
+    r: radius
+    colat: colatitude [radians]
+    lon: longitude [radians]
+    out: optional array of shape ``r.shape + (3,)`` to write into
+
+    Returns
+    -------
+    out: cartesian coordinates with x, y, z along the last axis
     """
-    r = spher_vec[0]
-    colat = spher_vec[1]
-    lon = spher_vec[2]
-    return np.array(
-        [
-            r * np.cos(lon) * np.sin(colat),
-            r * np.sin(lon) * np.sin(colat),
-            r * np.cos(colat),
-        ]
+    if out is None and np.ndim(r) == np.ndim(colat) == np.ndim(lon) == 0:
+        return np.array(_spherical_to_cartesian_scalar(r, colat, lon))
+    r, colat, lon = np.broadcast_arrays(r, colat, lon)
+    if out is None:
+        out = np.empty(r.shape + (3,))
+    spherical_to_cartesian_soa(
+        r, colat, lon, out=(out[..., 0], out[..., 1], out[..., 2])
     )
+    return out
+
+
+def _spherical_to_cartesian_scalar(r: float, colat: float, lon: float) -> tuple:
+    """
+    Single point spherical to cartesian using ``math``,
+    avoiding numpy call overhead for scalars.
+    """
+    rsc = r * math.sin(colat)
+    return rsc * math.cos(lon), rsc * math.sin(lon), r * math.cos(colat)
+
+
+def spherical_vec_to_cartesian(spher_vec: np.array) -> np.array:
+    """
+    Convert vector in spherical coordinates [r, colat, lon]
+    to cartesian x, y, z.
+    """
+    return spherical_to_cartesian(spher_vec[0], spher_vec[1], spher_vec[2])
 
 
 def scattering_angle(solar_incidence_vector, view_vector):
@@ -30,13 +115,30 @@ def scattering_angle(solar_incidence_vector, view_vector):
     and subtracting from pi.
     0 = forward scattering
     180 = back scattering
+    Vectors are along the last axis, so arrays of shape (N, 3)
+    return N angles.
+    """
+    if np.ndim(solar_incidence_vector) == np.ndim(view_vector) == 1:
+        return _scattering_angle_scalar(solar_incidence_vector, view_vector)
+    num = np.einsum("...i,...i->...", solar_incidence_vector, view_vector)
+    den = np.linalg.norm(solar_incidence_vector, axis=-1) * np.linalg.norm(
+        view_vector, axis=-1
+    )
+    # clip to guard against roundoff just outside [-1, 1]
+    cos_angle = np.clip(num / den, -1.0, 1.0)
+    return np.rad2deg(np.pi - np.arccos(cos_angle))
+
+
+def _scattering_angle_scalar(solar_incidence_vector, view_vector) -> float:
+    """
+    Scattering angle for a single pair of vectors using ``math``,
+    avoiding numpy call overhead.
     """
-    return np.rad2deg(
-        np.pi
-        - np.arccos(
-            (np.dot(solar_incidence_vector, view_vector))
-            / np.dot(
-                np.linalg.norm(solar_incidence_vector), np.linalg.norm(view_vector)
-            )
-        )
+    ax, ay, az = solar_incidence_vector
+    bx, by, bz = view_vector
+    num = ax * bx + ay * by + az * bz
+    den = math.sqrt(ax * ax + ay * ay + az * az) * math.sqrt(
+        bx * bx + by * by + bz * bz
     )
+    cos_angle = min(1.0, max(-1.0, num / den))
+    return math.degrees(math.pi - math.acos(cos_angle))
@@ -1,6 +1,8 @@
 import click
 import datetime as dt
+import functools
 import marstime as mt
+import numpy as np
 from typing import Callable
 
 """
@@ -9,6 +11,14 @@ Functions that build on ``marstime`` and ``marstiming`` package
 to convert datetimes to Mars Year and solar longitude and the reverse.
 """
 
+_REF_J2000 = dt.datetime(2000,1,1,12,0,0)
+_REF_1970 = dt.datetime(1970,1,1)
+_JD_OFFSET_1970 = 2440587.5 #JD on 1/1/1970 00:00:00
+_REF_MY1 = dt.datetime(1955,4,11,10,56,0) #Mars year 1
+_SECONDS_PER_DAY = 86400.
+_DPY = 686.9713 # days per Mars year
+_ONE_DAY = dt.timedelta(days=1)
+
 def dt_to_j2000offset(date: dt.datetime):
     """
     Convert datetime to J2000 offset for use in ``marstime`` functions.
@@ -21,9 +31,8 @@ def dt_to_j2000offset(date: dt.datetime):
     -------
     j2000_offset: J2000 offset value
     """
-    ref = dt.datetime(2000,1,1,12,0,0)
-    delta = date - ref
-    j2000_offset = delta.days + delta.seconds/86400
+    delta = date - _REF_J2000
+    j2000_offset = delta.days + delta.seconds/_SECONDS_PER_DAY
     return j2000_offset
 
 def getJD(date: dt.datetime):
@@ -31,21 +40,19 @@ def getJD(date: dt.datetime):
     Get Julian date in seconds given datetime
     From ``marstiming`` package
     """
-    ref_1970 = dt.datetime(1970, 1, 1)
-    offset = 2440587.5 #JD on 1/1/1970 00:00:00
-    diff = date - ref_1970
-    return diff.total_seconds()/86400. + offset
+    diff = date - _REF_1970
+    return diff.total_seconds()/_SECONDS_PER_DAY + _JD_OFFSET_1970
 
 def getUTC(jd: float):
     '''
     Get UTC given Julian Date in seconds
     From ``marstiming`` package
     '''
+    return _REF_1970 + dt.timedelta(
+        seconds=((jd-_JD_OFFSET_1970)*_SECONDS_PER_DAY)
+    )
 
-    offset = 2440587.5 #JD on 1/1/1970 00:00:00 
-
-    d1970 = dt.datetime(1970, 1, 1)
-    return d1970 + dt.timedelta(seconds=((jd-offset)*86400.))
+_JD_MY1 = getJD(_REF_MY1) # Julian date MY 1
 
 
 def mt_fnc_convert(date: dt.datetime, mt_fnc: Callable):
@@ -66,28 +73,62 @@ def dt_to_MY(date: dt.datetime):
     """
     return mt_fnc_convert(date, mt.Clancy_Year)
 
+@functools.lru_cache(maxsize=4096)
 def dt_to_MY_Ls(date: dt.datetime):
     """
-    Convert date to Mars Year and Ls
+    Convert date to Mars Year and Ls (cached, e.g. for repeated
+    file start times or range bounds)
     """
-    return dt_to_MY(date), dt_to_Ls(date)
+    return _j2000_to_MY_Ls(dt_to_j2000offset(date))
 
-def MY_Ls_to_UTC(MY: float, Ls: float, Ls_thresh: float=0.001) -> dt.datetime:
+def _j2000_to_MY_Ls(j2000_offset: float):
+    """
+    Mars Year and Ls from a J2000 offset computed once
+    """
+    return mt.Clancy_Year(j2000_offset), mt.Mars_Ls(j2000_offset)
+
+def MY_Ls_to_UTC(
+    MY: float, Ls: float, Ls_thresh: float=0.001, max_iter: int=50
+) -> dt.datetime:
     """
     Determine UTC from Clancy Mars Year and solar longitude.
-    Based on ``marstiming`` package
+    Based on ``marstiming`` package. Refines the initial guess with
+    secant steps on the Ls error and falls back to fixed steps
+    if that does not converge.
     
     MY: Mars Year
     Ls: Mars solar longitude
     Ls_thresh: threshold for error in Ls
+    max_iter: maximum number of secant steps
     
     date: UTC date
     """
-    DPY = 686.9713
+    return _MY_Ls_to_UTC_cached(MY, Ls, Ls_thresh, max_iter)
+
+@functools.lru_cache(maxsize=4096)
+def _MY_Ls_to_UTC_cached(
+    MY: float, Ls: float, Ls_thresh: float, max_iter: int
+) -> dt.datetime:
+    """
+    Cached MY_Ls_to_UTC, conversion is deterministic so repeated
+    Mars Year/Ls lookups are reused.
+    """
     # Initial guess
-    refTime = dt.datetime(1955,4,11,10,56,0) #Mars year 1
-    refDate = getJD(refTime) # Julian date MY 1
-    date = getUTC(refDate+(MY-1 + Ls/360.)*DPY) #initial guess date
+    date = getUTC(_JD_MY1+(MY-1 + Ls/360.)*_DPY) #initial guess date
+    # Secant iteration starting from two points one day apart
+    t0, f0 = date, Ls_error(date, Ls)
+    t1 = date + _ONE_DAY
+    f1 = Ls_error(t1, Ls)
+    for _ in range(max_iter):
+        if abs(f1) < Ls_thresh:
+            return t1
+        if f1 == f0:
+            break
+        step_days = -f1 * (t1 - t0).total_seconds() / _SECONDS_PER_DAY / (f1 - f0)
+        t0, f0 = t1, f1
+        t1 = t1 + dt.timedelta(days=step_days)
+        f1 = Ls_error(t1, Ls)
+    date = t1
     converge = 0
     counter = 0
     while converge == 0:
@@ -97,10 +138,17 @@ def MY_Ls_to_UTC(MY: float, Ls: float, Ls_thresh: float=0.001) -> dt.datetime:
             raise ValueError("Could not find Ls, too many attempts")
     return date
 
+def Ls_error(date: dt.datetime, Ls: float) -> float:
+    """
+    Difference between Ls at date and goal Ls, wrapped to [-180, 180)
+    """
+    return ((dt_to_Ls(date) - Ls + 180) % 360) - 180
+
 def check_and_update(date, MY, Ls, Ls_thresh):
-    new_MY, new_Ls = dt_to_MY_Ls(date) # regenerate MY, Ls from guess
+    j2000_offset = dt_to_j2000offset(date)
+    new_MY, new_Ls = _j2000_to_MY_Ls(j2000_offset) # regenerate MY, Ls from guess
     my_diff, ls_diff = MY_Ls_diff(new_MY, new_Ls, MY, Ls)
-    converge = 1 if ls_diff < Ls_thresh or abs(360-ls_diff) < Ls_thresh else 0
+    converge = 1 if abs(ls_diff) < Ls_thresh or abs(360-abs(ls_diff)) < Ls_thresh else 0
     if not converge:
         update_days = diff_to_days(ls_diff)
         date = date + dt.timedelta(days=update_days)
@@ -119,18 +167,17 @@ def MY_Ls_diff(input_my, input_Ls, goal_my, goal_Ls):
 
 
 def ltst(lon, subsolar_lon):
-    # [0, 24)
-    delta = lon - subsolar_lon
-    if delta < -180:
-        delta += 360
-    if delta >= 180:
-        delta -= 360
-    return (delta+180)*24/360
+    """
+    Local true solar time [0, 24) from longitude and subsolar longitude.
+    Works on scalars or arrays (e.g. whole DataFrame columns).
+    """
+    return np.mod(lon - subsolar_lon + 180, 360) * (24/360)
 
 class MarsDate:
     def __init__(self, my: int, ls: float):
         self._my = my
         self._ls = ls
+        self._str = None  # built on first to_str call
 
     # Read-only field accessors
     @property
@@ -144,9 +191,10 @@ class MarsDate:
         return self._ls
 
     @classmethod
-    def from_dt(cls, dt: dt.datetime):
+    def from_dt(cls, date: dt.datetime):
         """Create mars date from datetime object"""
-        my, ls = mt.dt_to_MY_Ls(dt)
+        # module-level conversion, not the marstime package (which has none)
+        my, ls = dt_to_MY_Ls(date)
         return cls(int(my), ls)
     
     @classmethod
@@ -156,10 +204,13 @@ class MarsDate:
         return cls(int(my), float(ls))
 
     def to_UTC(self, Ls_thresh: float=0.001):
-        return mt.MY_Ls_to_UTC(self.my, self.ls, Ls_thresh=Ls_thresh)
+        return MY_Ls_to_UTC(self.my, self.ls, Ls_thresh=Ls_thresh)
     
     def to_str(self):
-        return "MY"+str(self.my)+"Ls"+str(int(round(self.ls))).zfill(3)
+        # fields are read-only, so the string only needs building once
+        if self._str is None:
+            self._str = f"MY{self._my}Ls{int(round(self._ls)):03d}"
+        return self._str
 
     def __str__(self) -> str:
         return self.to_str()
@@ -1,19 +1,150 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
 import pytest
 
-from util.geom import scattering_angle, spherical_to_cartesian
+from util.geom import (
+    make_spherical_to_cartesian,
+    scattering_angle,
+    spherical_to_cartesian,
+    spherical_to_cartesian_soa,
+    spherical_vec_to_cartesian,
+)
+from util.mars_time import MarsDate, MY_Ls_to_UTC, dt_to_MY_Ls, ltst
+from util.time import (
+    ceil_to_x_hour,
+    convert_date_utc_columns,
+    convert_date_utcs,
+    floor_to_x_hour,
+    round_to_x_hour,
+)
 
 
 def test_s2c(sphere_coords, cart_coords):
     """
     Test spherical-->cartesian function
     """
-    convert = spherical_to_cartesian(sphere_coords)
+    convert = spherical_vec_to_cartesian(sphere_coords)
     assert convert == pytest.approx(cart_coords)
 
 
+def test_s2c_batch(sphere_coords, cart_coords):
+    """
+    Test spherical-->cartesian function on arrays of points
+    """
+    n = 4
+    r, colat, lon = [np.full(n, x) for x in sphere_coords]
+    convert = spherical_to_cartesian(r, colat, lon)
+    assert convert.shape == (n, 3)
+    assert convert == pytest.approx(np.tile(cart_coords, (n, 1)))
+
+
+def test_s2c_soa(sphere_coords, cart_coords):
+    """
+    Test spherical-->cartesian function with separate coordinate arrays
+    """
+    n = 4
+    r, colat, lon = [np.full(n, x) for x in sphere_coords]
+    x, y, z = spherical_to_cartesian_soa(r, colat, lon)
+    for coord, expected in zip((x, y, z), cart_coords):
+        assert coord == pytest.approx(np.full(n, expected))
+
+
+def test_s2c_fixed_radius(sphere_coords, cart_coords):
+    """
+    Test spherical-->cartesian function specialized to a fixed radius
+    """
+    s2c = make_spherical_to_cartesian(sphere_coords[0])
+    assert make_spherical_to_cartesian(sphere_coords[0]) is s2c
+    colat, lon = np.full(4, sphere_coords[1]), np.full(4, sphere_coords[2])
+    x, y, z = s2c(colat, lon)
+    for coord, expected in zip((x, y, z), cart_coords):
+        assert coord == pytest.approx(np.full(4, expected))
+
+
 def test_scattering_angle(cart_coords):
     """
     Test scattering angle. 0=forward, 180=back
     """
-    assert pytest.approx(scattering_angle(cart_coords, -cart_coords)) == 0.0
-    assert pytest.approx(scattering_angle(cart_coords, cart_coords)) == 180.0
+    assert scattering_angle(cart_coords, -cart_coords) == pytest.approx(0.0, abs=1e-5)
+    assert scattering_angle(cart_coords, cart_coords) == pytest.approx(180.0)
+
+
+def test_scattering_angle_batch(cart_coords):
+    """
+    Test scattering angle on arrays of vectors
+    """
+    solar = np.array([cart_coords, cart_coords, cart_coords])
+    view = np.array([-cart_coords, cart_coords, [0, 0, 1]])
+    angles = scattering_angle(solar, view)
+    expected = 180 - np.rad2deg(np.arccos(cart_coords[2] / np.linalg.norm(cart_coords)))
+    assert angles == pytest.approx([0.0, 180.0, expected], abs=1e-5)
+
+
+@pytest.mark.parametrize("my, ls", [(28, 180.0), (30, 359.9), (34, 90.5)])
+def test_MY_Ls_to_UTC(my, ls):
+    """
+    Test MY, Ls --> UTC conversion round trips within threshold
+    """
+    date = MY_Ls_to_UTC(my, ls, Ls_thresh=0.001)
+    new_my, new_ls = dt_to_MY_Ls(date)
+    assert new_my == my
+    assert new_ls == pytest.approx(ls, abs=0.001)
+
+
+def test_ltst():
+    """
+    Test LTST for scalars and arrays. Noon at subsolar longitude.
+    """
+    assert ltst(10.0, 10.0) == pytest.approx(12.0)
+    assert ltst(-170.0, 180.0) == pytest.approx(12 + 10 * 24 / 360)
+    lons = np.array([0.0, 90.0, 179.0, -180.0])
+    assert ltst(lons, 0.0) == pytest.approx([12.0, 18.0, 12 + 179 * 24 / 360, 0.0])
+
+
+def test_marsdate_str():
+    """
+    Test MarsDate string round trip
+    """
+    md = MarsDate.from_str("MY34Ls005")
+    assert (md.my, md.ls) == (34, 5.0)
+    assert str(md) == "MY34Ls005"
+    assert MarsDate(30, 270.4).to_str() == "MY30Ls270"
+
+
+def test_marsdate_dt_round_trip():
+    """
+    Test MarsDate <--> datetime conversion
+    """
+    md = MarsDate(34, 180.0)
+    date = md.to_UTC()
+    assert str(MarsDate.from_dt(date)) == "MY34Ls180"
+
+
+def test_convert_date_utc_columns():
+    """
+    Test column datetime conversion matches single value conversion
+    """
+    date = pd.Series([' "21-Dec-2008"', ' "21-Dec-2008"', None])
+    utc = pd.Series([' "20:00:00.186"', ' "23:59:59.999"', ' "00:00:00.000"'])
+    converted = convert_date_utc_columns(date, utc)
+    assert converted[0] == convert_date_utcs(date[0], utc[0])
+    assert converted[1] == dt.datetime(2008, 12, 21, 23, 59, 59, 999000)
+    assert pd.isnull(converted[2])
+
+
+def test_x_hour_rounding():
+    """
+    Test rounding datetimes to 4-hour file times
+    """
+    date = dt.datetime(2010, 1, 1, 5, 30)
+    aligned = dt.datetime(2010, 1, 1, 4)
+    assert floor_to_x_hour(date) == aligned
+    assert ceil_to_x_hour(date) == dt.datetime(2010, 1, 1, 8)
+    assert ceil_to_x_hour(aligned) == aligned
+    assert round_to_x_hour(date) == aligned
+    assert round_to_x_hour(date, force_up=True) == dt.datetime(2010, 1, 1, 8)
+    assert round_to_x_hour(dt.datetime(2010, 1, 1, 7)) == dt.datetime(2010, 1, 1, 8)
+    with pytest.raises(ValueError):
+        round_to_x_hour(date, force_down=True, force_up=True)
@@ -1,25 +1,41 @@
 import datetime as dt
 import pandas as pd
 
-def round_to_x_hour(date, hours=4, force_down=False, force_up=False):
+DATE_UTC_FMT = "%d-%b-%Y %H:%M:%S.%f"  # format of joined MCS Date and UTC
+DATE_FMT = "%d-%b-%Y"  # format of MCS Date
+
+def floor_to_x_hour(date, hours=4):
     """
-    Round datetime to nearest x-hour (For MCS 4-hour files)
+    Round datetime down to start of x-hour interval
     """
-    # Find closest interval
-    up = (date.hour % hours) > hours // 2  # above midpoint?
-    dt_start_of_xhour = date.replace(
+    if date.hour % hours == 0 and not (date.minute or date.second or date.microsecond):
+        return date  # already aligned, e.g. from a 4-hour date_range
+    return date.replace(
         hour=(date.hour // hours) * hours, minute=0, second=0, microsecond=0
     )
-    # determine if round up needed
+
+
+def ceil_to_x_hour(date, hours=4):
+    """
+    Round datetime up to next x-hour interval (unchanged if already aligned)
+    """
+    floor = floor_to_x_hour(date, hours)
+    return floor if floor == date else floor + dt.timedelta(hours=hours)
+
+
+def round_to_x_hour(date, hours=4, force_down=False, force_up=False):
+    """
+    Round datetime to nearest x-hour (For MCS 4-hour files)
+    force_down: always round down (same as ``floor_to_x_hour``)
+    force_up: always round up to the following x-hour, even if aligned
+    """
     if force_down and force_up:
         raise ValueError("Can't force rounding up and down")
-    elif force_down:
-        up = False  # force always round down to get filename from datetime
-    elif force_up:
-        up = True  # force always round up
-    # Round
-    if up:
-        # round up
+    dt_start_of_xhour = floor_to_x_hour(date, hours)
+    if force_down:
+        return dt_start_of_xhour
+    # round up if forced or above midpoint
+    if force_up or (date.hour % hours) > hours // 2:
         dt_start_of_xhour = dt_start_of_xhour + dt.timedelta(hours=hours)
     return dt_start_of_xhour
 
@@ -37,9 +53,37 @@ def convert_date_utcs(date: str, utc: str):
     -------
     _: signle datetime value
     """
-    fmt = "%d-%b-%Y %H:%M:%S.%f"
     if type(date) != str or type(utc) != str:
         date_str = pd.NaT
     else:
         date_str = date.strip().replace('"', "") + " " + utc.strip().replace('"', "")
-    return pd.to_datetime(date_str, format=fmt, errors="coerce")
\ No newline at end of file
+    return pd.to_datetime(date_str, format=DATE_UTC_FMT, errors="coerce")
+
+
+def convert_date_utc_columns(date: pd.Series, utc: pd.Series) -> pd.Series:
+    """
+    Convert MCS "Date" and "UTC" columns into datetimes.
+    Column version of ``convert_date_utcs``. There are only a few dates
+    per file, so each distinct date is parsed once and the times are
+    added as timedeltas (no per-row string joining or strptime).
+
+    Parameters
+    ----------
+    date: "Date" column
+    utc: "UTC" column
+
+    Returns
+    -------
+    _: datetime column (NaT where values can't be parsed)
+    """
+    date = date.str.strip().str.replace('"', "", regex=False)
+    utc = utc.str.strip().str.replace('"', "", regex=False)
+    codes, unique_dates = pd.factorize(date)
+    days = pd.to_datetime(pd.Index(unique_dates), format=DATE_FMT, errors="coerce")
+    # missing dates have code -1, which fills with NaT
+    day = pd.Series(
+        days.take(codes, allow_fill=True, fill_value=pd.NaT), index=date.index
+    )
+    datetimes = day + pd.to_timedelta(utc, errors="coerce")
+    # fixed resolution, so it doesn't depend on the values (or lack of them)
+    return datetimes.astype("datetime64[ns]")
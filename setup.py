@@ -20,6 +20,7 @@ setup(
         "marstime==0.5.6",
         "numpy==1.23.0",
         "pandas==1.4.3",
+        "pyarrow==8.0.0",
         "pytest==7.1.2",
     ],
 )